@@ -1,8 +1,13 @@
 import json
 import re
-from typing import Dict, List, Any
+import string
+import hashlib
+from array import array
+from collections import Counter
+from bisect import bisect_left
+from typing import Dict, List, Any, Optional
 
-class ArvixSubtopicConverter:
+class ArxivSubtopicConverter:
     def __init__(self):
         # Comprehensive category-based lookup tables using Agricultural and Food Sciences classification data
         self.category_mappings = {
@@ -103,13 +108,8 @@ class ArvixSubtopicConverter:
             'Expert': ['cutting-edge', 'novel', 'state-of-the-art', 'pioneering', 'breakthrough', 'frontier']
         }
 
-def extract_keywords_from_text(self, text: str) -> List[str]:
-        """Extract relevant agricultural and food science keywords from title and abstract."""
-        text_lower = text.lower()
-        keywords = []
-
         # Agricultural and food science domain keywords
-        agri_keywords = [
+        self.agri_keywords = [
             # General agriculture
             'agriculture', 'agricultural', 'farming', 'farm', 'crop', 'crops', 'cultivation', 'field',
             'harvest', 'yield', 'production', 'productivity', 'agronomy', 'agronomic', 'planting',
@@ -185,11 +185,26 @@ def extract_keywords_from_text(self, text: str) -> List[str]:
             'poverty', 'smallholder', 'farmer', 'producer', 'consumer'
         ]
 
-        for keyword in agri_keywords:
-            if keyword in text_lower:
-                keywords.append(keyword)
+        # Matched on whole words, so e.g. 'ph' or 'hen' no longer fire inside 'photon'/'when'
+        self.keyword_separators = str.maketrans(dict.fromkeys(string.punctuation, ' '))
+        self.keyword_words = frozenset(k for k in self.agri_keywords if ' ' not in k)
+        self.keyword_phrases = {}
+        for keyword in self.agri_keywords:
+            if ' ' in keyword:
+                words = tuple(keyword.split())
+                self.keyword_phrases.setdefault(words[0], set()).add(words)
+
+    def extract_keywords_from_text(self, text: str) -> List[str]:
+        """Extract relevant agricultural and food science keywords from title and abstract."""
+        tokens = text.lower().translate(self.keyword_separators).split()
+        keywords = set(self.keyword_words.intersection(tokens))
+        if not self.keyword_phrases.keys().isdisjoint(tokens):
+            for i, token in enumerate(tokens):
+                for phrase in self.keyword_phrases.get(token, ()):
+                    if tuple(tokens[i:i + len(phrase)]) == phrase:
+                        keywords.add(' '.join(phrase))
+        return sorted(keywords)
 
-        return keywords
     def determine_granularity(self, metadata: Dict[str, Any]) -> str:
             """Determine granularity level based on metadata."""
             title = metadata.get('title', '').lower()
@@ -543,7 +558,488 @@ def is_qbio_paper(metadata):
     cats = set(categories.split())
     return bool(QBIO_CATEGORIES & cats)
 
-def process_json_file(input_file: str, output_file: str = None, physics_only: bool = True, qbio_only: bool = False,agriculture_only: bool = False) -> List[Dict[str, Any]]:
+LABEL_FIELDS = ('granularity_level', 'bloom_taxonomy', 'expertise_level')
+
+# Compact in-memory result storage
+class StringVocabulary:
+    """Interns repeated strings as small integer codes."""
+
+    def __init__(self):
+        self.strings = []
+        self.codes = {}
+
+    def intern(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def __getitem__(self, code: int) -> str:
+        return self.strings[code]
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+class PackedStrings:
+    """Mostly-unique strings stored back to back as UTF-8 with an offset array."""
+
+    def __init__(self):
+        self.data = bytearray()
+        # 4-byte offsets until the packed data outgrows them
+        self.offsets = array('I', [0])
+
+    def append(self, value: str) -> None:
+        self.data += value.encode('utf-8')
+        if self.offsets.typecode == 'I' and len(self.data) > 0xFFFFFFFF:
+            self.offsets = array('Q', self.offsets)
+        self.offsets.append(len(self.data))
+
+    def raw(self, index: int) -> bytes:
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]])
+
+    def __getitem__(self, index: int) -> str:
+        return self.raw(index).decode('utf-8')
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+class SubtopicResults:
+    """Columnar store of converted papers.
+
+    Label fields are one-byte codes into per-field vocabularies; categories,
+    prerequisites and next topics are interned into a shared vocabulary and
+    list fields use offset arrays. Items are rebuilt as the usual result
+    dicts on access.
+
+    Integer indexes select by position; string keys, get() and ``in`` look
+    results up by original_id through an array of rows sorted by id hash,
+    built on first lookup. Ids are stored JSON-encoded so integer ids
+    round-trip unchanged.
+    """
+
+    def __init__(self):
+        self.vocab = StringVocabulary()
+        self.ids = PackedStrings()
+        self._index_rows = array('I')
+        self.names = PackedStrings()
+        self.categories = array('I')
+        self.label_vocabs = {field: StringVocabulary() for field in LABEL_FIELDS}
+        self.labels = {field: array('B') for field in LABEL_FIELDS}
+        # 2-byte vocabulary codes until the shared vocabulary outgrows them
+        self.prerequisites = array('H')
+        self.prerequisite_offsets = array('I', [0])
+        self.next_topics = array('H')
+        self.next_topic_offsets = array('I', [0])
+
+    def append(self, result: Dict[str, Any]) -> None:
+        """Add a result dict with original_id, original_categories and subtopic."""
+        subtopic = result['subtopic']
+        self.ids.append(json.dumps(result['original_id'], ensure_ascii=False))
+        self.names.append(subtopic['name'])
+        self.categories.append(self.vocab.intern(result['original_categories']))
+        for field in LABEL_FIELDS:
+            self.labels[field].append(self.label_vocabs[field].intern(subtopic[field]))
+        prerequisites = [self.vocab.intern(p) for p in subtopic['prerequisites']]
+        next_topics = [self.vocab.intern(t) for t in subtopic['next_topics']]
+        if self.prerequisites.typecode == 'H' and len(self.vocab) > 0xFFFF:
+            self.prerequisites = array('I', self.prerequisites)
+            self.next_topics = array('I', self.next_topics)
+        self.prerequisites.extend(prerequisites)
+        self.prerequisite_offsets.append(len(self.prerequisites))
+        self.next_topics.extend(next_topics)
+        self.next_topic_offsets.append(len(self.next_topics))
+
+    def _item(self, index: int) -> Dict[str, Any]:
+        vocab = self.vocab
+        prereq_start, prereq_end = self.prerequisite_offsets[index], self.prerequisite_offsets[index + 1]
+        topic_start, topic_end = self.next_topic_offsets[index], self.next_topic_offsets[index + 1]
+        return {
+            'original_id': json.loads(self.ids[index]),
+            'original_categories': vocab[self.categories[index]],
+            'subtopic': {
+                'name': self.names[index],
+                'granularity_level': self.label(index, 'granularity_level'),
+                'bloom_taxonomy': self.label(index, 'bloom_taxonomy'),
+                'expertise_level': self.label(index, 'expertise_level'),
+                'prerequisites': [vocab[c] for c in self.prerequisites[prereq_start:prereq_end]],
+                'next_topics': [vocab[c] for c in self.next_topics[topic_start:topic_end]]
+            }
+        }
+
+    def label(self, index: int, field: str) -> str:
+        return self.label_vocabs[field][self.labels[field][index]]
+
+    def _row_hash(self, row: int) -> int:
+        # The index lives only in memory, so the built-in (per-process) hash is enough
+        return hash(self.ids.raw(row))
+
+    def _row(self, original_id: Any) -> int:
+        """Row of the first result with original_id, or -1."""
+        if len(self._index_rows) != len(self):
+            # Hashes are recomputed on demand rather than stored, so the index costs 4 bytes per row
+            data, offsets = bytes(self.ids.data), self.ids.offsets
+            hashes = [hash(data[offsets[row]:offsets[row + 1]]) for row in range(len(self))]
+            self._index_rows = array('I', sorted(range(len(self)), key=hashes.__getitem__))
+        encoded_id = json.dumps(original_id, ensure_ascii=False).encode('utf-8')
+        target = hash(encoded_id)
+        rows = self._index_rows
+        position = bisect_left(rows, target, key=self._row_hash)
+        # Sorting is stable, so equal hashes are visited in insertion order
+        while position < len(rows) and self._row_hash(rows[position]) == target:
+            if self.ids.raw(rows[position]) == encoded_id:
+                return rows[position]
+            position += 1
+        return -1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._item(i) for i in range(*index.indices(len(self)))]
+        if isinstance(index, str):
+            row = self._row(index)
+            if row < 0:
+                raise KeyError(index)
+            return self._item(row)
+        if not isinstance(index, int):
+            raise TypeError(f"results indices must be integers, slices or id strings, not {type(index).__name__}")
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("result index out of range")
+        return self._item(index)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._item(index)
+
+    def __contains__(self, original_id: Any) -> bool:
+        return self._row(original_id) >= 0
+
+    def get(self, original_id: Any, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Return the first result with the given original_id, or default."""
+        row = self._row(original_id)
+        return self._item(row) if row >= 0 else default
+
+    def label_counts(self, field: str) -> Dict[str, int]:
+        """Count values of a label field straight from the code array."""
+        vocab = self.label_vocabs[field]
+        return {vocab[code]: count for code, count in Counter(self.labels[field]).items()}
+
+# Streaming run statistics (bounded memory, mergeable across workers/shards)
+class CountMinSketch:
+    """Fixed-size frequency sketch; estimates never undercount."""
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.table = [array('q', [0]) * width for _ in range(depth)]
+        # Keywords and prerequisites come from small vocabularies, so cache their cells
+        self._index_cache = {}
+
+    def _indexes(self, item: str) -> List[int]:
+        indexes = self._index_cache.get(item)
+        if indexes is not None:
+            return indexes
+        # hashlib rather than hash() so every worker maps items to the same cells
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        indexes = [(h1 + i * h2) % self.width for i in range(self.depth)]
+        if len(self._index_cache) >= 4096:
+            self._index_cache.clear()
+        self._index_cache[item] = indexes
+        return indexes
+
+    def add(self, item: str, count: int = 1) -> int:
+        """Add count for item and return its new estimate."""
+        estimate = None
+        for row, idx in zip(self.table, self._indexes(item)):
+            row[idx] += count
+            if estimate is None or row[idx] < estimate:
+                estimate = row[idx]
+        return estimate
+
+    def estimate(self, item: str) -> int:
+        """Estimated count for item."""
+        return min(row[idx] for row, idx in zip(self.table, self._indexes(item)))
+
+    def merge(self, other: 'CountMinSketch') -> None:
+        """Add another sketch of the same shape into this one."""
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Cannot merge sketches with different dimensions")
+        for row, other_row in zip(self.table, other.table):
+            for idx, value in enumerate(other_row):
+                row[idx] += value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'width': self.width, 'depth': self.depth, 'table': [row.tolist() for row in self.table]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CountMinSketch':
+        sketch = cls(data['width'], data['depth'])
+        sketch.table = [array('q', row) for row in data['table']]
+        return sketch
+
+class HeavyHitters:
+    """Top-k frequent strings tracked with a count-min sketch."""
+
+    def __init__(self, capacity: int = 100, width: int = 2048, depth: int = 4):
+        self.capacity = capacity
+        self.sketch = CountMinSketch(width, depth)
+        self.candidates = {}
+        # Lower bound on the smallest candidate count; counts only grow, so it stays valid
+        self._floor = 0
+
+    def add(self, item: str, count: int = 1) -> None:
+        """Count an occurrence of item."""
+        estimate = self.sketch.add(item, count)
+        if item in self.candidates or len(self.candidates) < self.capacity:
+            self.candidates[item] = estimate
+            return
+        if estimate <= self._floor:
+            return
+        weakest = min(self.candidates, key=self.candidates.get)
+        self._floor = self.candidates[weakest]
+        if estimate > self._floor:
+            del self.candidates[weakest]
+            self.candidates[item] = estimate
+
+    def merge(self, other: 'HeavyHitters') -> None:
+        """Merge another tracker into this one."""
+        self.sketch.merge(other.sketch)
+        merged = {item: self.sketch.estimate(item) for item in set(self.candidates) | set(other.candidates)}
+        self.candidates = dict(sorted(merged.items(), key=lambda kv: -kv[1])[:self.capacity])
+        self._floor = 0
+
+    def top(self, n: int = None) -> List[List[Any]]:
+        """Most frequent items as [item, estimated_count] pairs."""
+        ranked = sorted(self.candidates.items(), key=lambda kv: (-kv[1], kv[0]))
+        return [list(kv) for kv in ranked[:n]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'capacity': self.capacity, 'sketch': self.sketch.to_dict(), 'candidates': self.candidates}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'HeavyHitters':
+        tracker = cls(data['capacity'])
+        tracker.sketch = CountMinSketch.from_dict(data['sketch'])
+        tracker.candidates = dict(data['candidates'])
+        return tracker
+
+class RunStatistics:
+    """Streaming aggregates of converted subtopics for a run."""
+
+    def __init__(self, top_k: int = 100, width: int = 2048, depth: int = 4):
+        self.total = 0
+        # Label spaces are tiny, so per-category counts are kept exactly
+        self.labels = {}
+        self.keywords = HeavyHitters(top_k, width, depth)
+        self.prerequisites = HeavyHitters(top_k, width, depth)
+
+    def update(self, metadata: Dict[str, Any], subtopic: Dict[str, Any], keywords: List[str] = ()) -> None:
+        """Record one converted paper."""
+        self.total += 1
+        categories = (metadata.get('categories') or '').split()
+        primary_category = categories[0] if categories else 'unknown'
+        counts = self.labels.get(primary_category)
+        if counts is None:
+            counts = self.labels[primary_category] = {field: Counter() for field in LABEL_FIELDS}
+        for field in LABEL_FIELDS:
+            counts[field][subtopic[field]] += 1
+        for keyword in keywords:
+            self.keywords.add(keyword)
+        for prerequisite in subtopic.get('prerequisites', []):
+            self.prerequisites.add(prerequisite)
+
+    def merge(self, other: 'RunStatistics') -> None:
+        """Merge statistics from another worker or shard."""
+        self.total += other.total
+        for category, other_counts in other.labels.items():
+            counts = self.labels.get(category)
+            if counts is None:
+                counts = self.labels[category] = {field: Counter() for field in LABEL_FIELDS}
+            for field in LABEL_FIELDS:
+                counts[field].update(other_counts[field])
+        self.keywords.merge(other.keywords)
+        self.prerequisites.merge(other.prerequisites)
+
+    def summary(self, top_n: int = 20) -> Dict[str, Any]:
+        """Human-readable summary of the run."""
+        return {
+            'total_papers': self.total,
+            'label_distribution': {
+                category: {field: dict(counts[field].most_common()) for field in LABEL_FIELDS}
+                for category, counts in sorted(self.labels.items())
+            },
+            'top_keywords': self.keywords.top(top_n),
+            'top_prerequisites': self.prerequisites.top(top_n)
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self.summary()
+        # Raw sketch state so shard summaries can be merged later
+        data['state'] = {
+            'labels': {category: {field: dict(counts[field]) for field in LABEL_FIELDS}
+                       for category, counts in self.labels.items()},
+            'keywords': self.keywords.to_dict(),
+            'prerequisites': self.prerequisites.to_dict()
+        }
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RunStatistics':
+        stats = cls()
+        state = data['state']
+        stats.total = data['total_papers']
+        stats.labels = {category: {field: Counter(counts[field]) for field in LABEL_FIELDS}
+                        for category, counts in state['labels'].items()}
+        stats.keywords = HeavyHitters.from_dict(state['keywords'])
+        stats.prerequisites = HeavyHitters.from_dict(state['prerequisites'])
+        return stats
+
+    def save(self, path: str) -> None:
+        """Write the summary JSON (including mergeable state) to path."""
+        data = self.to_dict()
+        state = data.pop('state')
+        # Indent the readable summary only; the sketch tables go on a single line at the end.
+        # JSON text never contains raw newlines, so nested values can be re-indented safely.
+        members = [f"  {json.dumps(key)}: " + json.dumps(value, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+                   for key, value in data.items()]
+        members.append('  "state": ' + json.dumps(state, ensure_ascii=False, separators=(',', ':')))
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{\n' + ',\n'.join(members) + '\n}\n')
+
+    @classmethod
+    def load(cls, path: str) -> 'RunStatistics':
+        """Load a summary JSON written by save()."""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        try:
+            return cls.from_dict(data)
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Not a statistics summary: {path} (missing {e})")
+
+def merge_stats_files(input_files: List[str], output_file: str) -> 'RunStatistics':
+    """Merge per-shard statistics summaries into a single summary file."""
+    merged = RunStatistics.load(input_files[0])
+    for path in input_files[1:]:
+        merged.merge(RunStatistics.load(path))
+    merged.save(output_file)
+    return merged
+
+# Streaming deduplication of repeated and cross-listed records
+class BloomFilter:
+    """Fixed-size set membership filter; may report false positives, never false negatives."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        import math
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _indexes(self, item: str) -> List[int]:
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item: str) -> bool:
+        """Add item; return True if it was (probably) already present."""
+        present = True
+        for idx in self._indexes(item):
+            byte, bit = divmod(idx, 8)
+            if not self.bits[byte] & (1 << bit):
+                present = False
+                self.bits[byte] |= 1 << bit
+        return present
+
+class RecordDeduplicator:
+    """Drop records already seen by id or by normalized title+abstract."""
+
+    # Shorter text (e.g. a bare "Erratum" title) is too generic to identify a paper
+    MIN_FINGERPRINT_CHARS = 40
+
+    def __init__(self, bloom_capacity: int = None, duplicates_file: str = None):
+        # Exact mode maps ids and 64-bit content fingerprints to the kept id;
+        # Bloom mode caps memory at the cost of rare false positives and
+        # cannot tell which id was kept.
+        if bloom_capacity is not None and bloom_capacity < 1:
+            raise ValueError("Bloom filter capacity must be a positive integer")
+        self.bloom_capacity = bloom_capacity
+        if bloom_capacity:
+            self.seen_ids = BloomFilter(bloom_capacity)
+            self.seen_content = BloomFilter(bloom_capacity)
+        else:
+            self.seen_ids = {}
+            self.seen_content = {}
+        self.duplicates_file = duplicates_file
+        self.duplicate_count = 0
+        # Truncate once per run so reruns do not accumulate old mappings
+        self._sidecar = open(duplicates_file, 'w', encoding='utf-8') if duplicates_file else None
+
+    @classmethod
+    def fingerprint(cls, metadata: Dict[str, Any]) -> str:
+        """Hash of the normalized title and abstract, or '' if there is too little text."""
+        title = re.sub(r'[^a-z0-9]+', ' ', (metadata.get('title') or '').lower()).strip()
+        abstract = re.sub(r'[^a-z0-9]+', ' ', (metadata.get('abstract') or '').lower()).strip()
+        normalized = f"{title} {abstract}"
+        if not title or not abstract or len(normalized) < cls.MIN_FINGERPRINT_CHARS:
+            return ''
+        return hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).hexdigest()
+
+    def is_duplicate(self, metadata: Dict[str, Any]) -> bool:
+        """Return True if the record was seen before, otherwise remember it."""
+        paper_id = metadata.get('id')
+        # Ids may be strings (arXiv) or integers (S2 corpus ids); 0 is a valid id
+        has_id = paper_id is not None and paper_id != ''
+        fingerprint = self.fingerprint(metadata)
+
+        if self.bloom_capacity:
+            if has_id and self.seen_ids.add(json.dumps(paper_id, ensure_ascii=False)):
+                self._record(paper_id, None, 'id')
+                return True
+            if fingerprint and self.seen_content.add(fingerprint):
+                self._record(paper_id, None, 'content')
+                return True
+            return False
+
+        if has_id and paper_id in self.seen_ids:
+            self._record(paper_id, self.seen_ids[paper_id], 'id')
+            return True
+
+        if fingerprint:
+            key = int(fingerprint, 16)
+            if key in self.seen_content:
+                kept_id = self.seen_content[key]
+                # Later copies under this id map to the record that was actually kept
+                if has_id:
+                    self.seen_ids[paper_id] = kept_id
+                self._record(paper_id, kept_id, 'content')
+                return True
+            self.seen_content[key] = paper_id
+
+        if has_id:
+            self.seen_ids[paper_id] = paper_id
+        return False
+
+    def _record(self, duplicate_id: str, original_id: str, reason: str) -> None:
+        self.duplicate_count += 1
+        if self._sidecar is not None:
+            self._sidecar.write(json.dumps({
+                'duplicate_id': duplicate_id,
+                'original_id': original_id,
+                'reason': reason
+            }, ensure_ascii=False) + '\n')
+
+    def close(self) -> None:
+        if self._sidecar is not None:
+            self._sidecar.close()
+            self._sidecar = None
+
+def process_json_file(input_file: str, output_file: str = None, physics_only: bool = True, qbio_only: bool = False,agriculture_only: bool = False, stats_file: str = None, dedup: bool = False, bloom_capacity: int = None, duplicates_file: str = None) -> SubtopicResults:
     """Process ArXiv metadata from JSON file."""
     import os
 
@@ -551,7 +1047,10 @@ def process_json_file(input_file: str, output_file: str = None, physics_only: bo
         raise FileNotFoundError(f"Input file not found: {input_file}")
 
     converter = ArxivSubtopicConverter()
-    results = []
+    stats = RunStatistics() if stats_file else None
+    deduplicator = RecordDeduplicator(bloom_capacity, duplicates_file) if dedup else None
+    results = SubtopicResults()
+    written = 0
     physics_count = 0
     total_count = 0
 
@@ -579,10 +1078,15 @@ def process_json_file(input_file: str, output_file: str = None, physics_only: bo
                                 continue
                             if agriculture_only and not is_agriculture_paper(metadata):
                                 continue
+                            if deduplicator is not None and deduplicator.is_duplicate(metadata):
+                                continue
                         
 
                             physics_count += 1
                             subtopic = converter.convert_metadata(metadata)
+                            if stats is not None:
+                                text = f"{metadata.get('title') or ''} {metadata.get('abstract') or ''}"
+                                stats.update(metadata, subtopic, converter.extract_keywords_from_text(text))
 
                             # Add original metadata for reference
                             result = {
@@ -594,12 +1098,12 @@ def process_json_file(input_file: str, output_file: str = None, physics_only: bo
 
                             if physics_count % 100 == 0:
                                 print(f"Processed {physics_count} physics papers...")
-                                # Write batch to file and clear results
+                                # Write new results to file; the compact store keeps them all
                                 if output_file:
                                     with open(output_file, 'a', encoding='utf-8') as f_out:
-                                        for r in results:
+                                        for r in results[written:]:
                                             f_out.write(json.dumps(r, ensure_ascii=False) + '\n')
-                                    results.clear()
+                                    written = len(results)
 
                         except json.JSONDecodeError as e:
                             print(f"Warning: Invalid JSON on line {line_num}: {e}")
@@ -624,9 +1128,14 @@ def process_json_file(input_file: str, output_file: str = None, physics_only: bo
                         continue
                     if agriculture_only and not is_agriculture_paper(metadata):
                         continue
+                    if deduplicator is not None and deduplicator.is_duplicate(metadata):
+                        continue
 
                     physics_count += 1
                     subtopic = converter.convert_metadata(metadata)
+                    if stats is not None:
+                        text = f"{metadata.get('title') or ''} {metadata.get('abstract') or ''}"
+                        stats.update(metadata, subtopic, converter.extract_keywords_from_text(text))
 
                     result = {
                         'original_id': metadata.get('id', f'item_{physics_count}'),
@@ -637,27 +1146,38 @@ def process_json_file(input_file: str, output_file: str = None, physics_only: bo
 
                     if physics_count % 100 == 0:
                         print(f"Processed {physics_count} physics papers...")
-                        # Write batch to file and clear results
+                        # Write new results to file; the compact store keeps them all
                         if output_file:
                             with open(output_file, 'a', encoding='utf-8') as f_out:
-                                for r in results:
+                                for r in results[written:]:
                                     f_out.write(json.dumps(r, ensure_ascii=False) + '\n')
-                            results.clear()
+                            written = len(results)
 
     except json.JSONDecodeError as e:
         raise ValueError(f"Invalid JSON format: {e}")
     except Exception as e:
         raise ValueError(f"Error reading file: {e}")
+    finally:
+        if deduplicator is not None:
+            deduplicator.close()
 
     print(f"\nProcessing complete!")
     print(f"Total papers processed: {total_count}")
     print(f"Physics papers found: {physics_count}")
+    if deduplicator is not None:
+        print(f"Duplicates skipped: {deduplicator.duplicate_count}")
+        if duplicates_file and deduplicator.duplicate_count:
+            print(f"Duplicate mapping saved to: {duplicates_file}")
     print(f"Conversion success rate: {len(results)}/{physics_count}")
 
+    if stats is not None:
+        stats.save(stats_file)
+        print(f"Run statistics saved to: {stats_file}")
+
     # Write any remaining results
-    if output_file and results:
+    if output_file and len(results) > written:
         with open(output_file, 'a', encoding='utf-8') as f:
-            for r in results:
+            for r in results[written:]:
                 f.write(json.dumps(r, ensure_ascii=False) + '\n')
         print(f"Results saved to: {output_file}")
     elif not output_file:
@@ -671,21 +1191,220 @@ def process_json_file(input_file: str, output_file: str = None, physics_only: bo
 
     return results
 
+# Profiling of the conversion loop
+class StackSampler:
+    """Sampling profiler that records collapsed call stacks for flame graph tools."""
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.stacks = Counter()
+        self._previous_handler = None
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+            frame = frame.f_back
+        self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        import signal
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> None:
+        import signal
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler)
+
+    def save(self, path: str) -> None:
+        """Write stacks in collapsed format ("frame;frame;frame count")."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+def load_profile_sample(input_file: str, sample_size: int, physics_only: bool = True, qbio_only: bool = False, agriculture_only: bool = False) -> List[str]:
+    """Return up to sample_size JSON Lines records that pass the category filters.
+
+    JSON Lines input is streamed and the original lines are kept as read;
+    a JSON array has to be parsed whole, so its records are re-serialized.
+    """
+    import os
+
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(f"Input file not found: {input_file}")
+
+    def selected(metadata):
+        if physics_only and not is_physics_paper(metadata):
+            return False
+        if qbio_only and not is_qbio_paper(metadata):
+            return False
+        if agriculture_only and not is_agriculture_paper(metadata):
+            return False
+        return True
+
+    sample = []
+    with open(input_file, 'r', encoding='utf-8') as f:
+        first_char = ''
+        while True:
+            first_char = f.read(1)
+            if not first_char or not first_char.isspace():
+                break
+        f.seek(0)
+
+        if first_char == '{':
+            for line_num, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    metadata = json.loads(line.strip())
+                except json.JSONDecodeError as e:
+                    print(f"Warning: Invalid JSON on line {line_num}: {e}")
+                    continue
+                if selected(metadata):
+                    sample.append(line.strip())
+                    if len(sample) >= sample_size:
+                        break
+        else:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON format: {e}")
+            for metadata in ([data] if isinstance(data, dict) else data):
+                if selected(metadata):
+                    sample.append(json.dumps(metadata, ensure_ascii=False))
+                    if len(sample) >= sample_size:
+                        break
+    return sample
+
+def profile_json_file(input_file: str, sample_size: int = 1000, output_prefix: str = 'conversion_profile', physics_only: bool = True, qbio_only: bool = False, agriculture_only: bool = False, stats: bool = False, dedup: bool = False, bloom_capacity: int = None) -> Dict[str, float]:
+    """Profile process_json_file on a sample of records.
+
+    The sample is written to a temporary JSON Lines file and run through
+    process_json_file itself, with the same filters and stats/dedup options
+    and output going to a temporary file. Writes <output_prefix>.pstats
+    (cProfile) and <output_prefix>.collapsed (sampled stacks) and returns
+    cumulative seconds per converter method and per pipeline stage.
+    """
+    import cProfile
+    import contextlib
+    import os
+    import pstats
+    import tempfile
+
+    if sample_size < 1:
+        raise ValueError("Profile sample size must be a positive integer")
+
+    sample = load_profile_sample(input_file, sample_size, physics_only, qbio_only, agriculture_only)
+    if not sample:
+        raise ValueError("No records matched the selected categories")
+
+    # Functions in this module worth reporting, keyed the way pstats keys them
+    stage_functions = [getattr(ArxivSubtopicConverter, name) for name in vars(ArxivSubtopicConverter)
+                       if name == '__init__' or name.startswith(('determine_', 'generate_', 'convert_', 'extract_'))]
+    stage_functions += [process_json_file, SubtopicResults.append, RunStatistics.update, RecordDeduplicator.is_duplicate]
+    stage_names = {(os.path.abspath(fn.__code__.co_filename), fn.__code__.co_firstlineno, fn.__name__): fn.__qualname__
+                   for fn in stage_functions}
+    json_file = os.path.abspath(json.__file__)
+
+    def stage_name(filename, line, funcname):
+        if filename == '~':
+            # Built-ins: file I/O shows up as io.open and TextIOWrapper methods
+            if funcname == '<built-in method io.open>':
+                return 'I/O: open'
+            if "of '_io.TextIOWrapper' objects" in funcname:
+                return f"I/O: {funcname.split(chr(39))[1]}"
+            return None
+        if os.path.abspath(filename) == json_file and funcname in ('loads', 'dumps'):
+            return f"json.{funcname}"
+        return stage_names.get((os.path.abspath(filename), line, funcname))
+
+    print(f"Profiling {len(sample)} records from: {input_file}")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sample_file = os.path.join(tmp_dir, 'sample.jsonl')
+        with open(sample_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(sample) + '\n')
+
+        def run_conversion():
+            output_file = os.path.join(tmp_dir, 'output.jsonl')
+            if os.path.exists(output_file):
+                os.remove(output_file)
+            stats_file = os.path.join(tmp_dir, 'stats.json') if stats else None
+            # Progress output still runs (and is timed) but is kept off the terminal
+            with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+                process_json_file(sample_file, output_file, physics_only, qbio_only, agriculture_only,
+                                  stats_file, dedup, bloom_capacity)
+
+        profiler = cProfile.Profile()
+        profiler.runcall(run_conversion)
+        pstats_file = f"{output_prefix}.pstats"
+        profiler.dump_stats(pstats_file)
+
+        # Separate pass so deterministic profiling overhead does not skew the samples
+        collapsed_file = f"{output_prefix}.collapsed"
+        sampler = StackSampler()
+        try:
+            sampler.start()
+        except (AttributeError, ValueError):
+            # setitimer/SIGPROF are unavailable on Windows and outside the main thread
+            sampler = None
+            collapsed_file = None
+        if sampler is not None:
+            try:
+                run_conversion()
+            finally:
+                sampler.stop()
+            sampler.save(collapsed_file)
+
+    timings = {}
+    for (filename, line, funcname), (_, calls, _, cumtime, _) in pstats.Stats(pstats_file).stats.items():
+        name = stage_name(filename, line, funcname)
+        if name:
+            timings[name] = timings.get(name, 0.0) + cumtime
+
+    print(f"{'Stage':<50} {'Total (s)':>10} {'Per record (ms)':>16}")
+    print("-" * 78)
+    for name, cumtime in sorted(timings.items(), key=lambda kv: -kv[1]):
+        print(f"{name:<50} {cumtime:>10.4f} {cumtime / len(sample) * 1000:>16.4f}")
+    print(f"\npstats dump saved to: {pstats_file}")
+    if collapsed_file:
+        print(f"Collapsed stacks saved to: {collapsed_file}")
+    else:
+        print("Collapsed stacks skipped: sampling profiler not supported here")
+
+    return timings
+
 def show_usage():
     """Display usage information."""
     print("ArXiv Metadata to Educational Subtopic Converter")
     print("=" * 50)
     print("\nUsage:")
-    print("  python converter.py <input_file> [output_file] [--all] [--qbio]")
+    print("  python converter.py <input_file> [output_file] [--all] [--qbio] [--stats=FILE] [--dedup]")
+    print("  python converter.py <input_file> --profile [--profile-sample=N] [--profile-out=PREFIX]")
+    print("  python converter.py --merge-stats <output_file> <stats_file> [stats_file ...]")
     print("\nArguments:")
     print("  input_file   : JSON file containing ArXiv metadata")
     print("  output_file  : Optional output file for results (JSON format)")
     print("  --all        : Process all papers, not just physics papers")
     print("  --qbio       : Process only quantitative biology (q-bio) papers")
+    print("  --stats=FILE : Write label distributions and top keywords/prerequisites to FILE")
+    print("  --merge-stats: Merge per-shard --stats files into one summary")
+    print("  --dedup      : Skip records already seen by id or by title+abstract")
+    print("  --dedup-bloom=N : Like --dedup, but with a Bloom filter sized for N records")
+    print("  --duplicates=FILE : Write duplicate -> original id mapping to FILE")
+    print("  --profile    : Profile process_json_file on a sample instead of processing the file")
+    print("  --profile-sample=N : Number of records to profile (default 1000)")
+    print("  --profile-out=PREFIX : Write PREFIX.pstats and PREFIX.collapsed (default conversion_profile)")
     print("\nExamples:")
     print("  python converter.py arxiv_data.json")
     print("  python converter.py arxiv_data.json results.json")
     print("  python converter.py arxiv_data.json results.json --all")
+    print("  python converter.py shard1.json out1.json --stats=stats1.json")
+    print("  python converter.py --merge-stats stats.json stats1.json stats2.json")
+    print("  python converter.py arxiv_data.json --agri --profile --profile-sample=500")
     print("\nInput file formats supported:")
     print("  - JSON array: [{...}, {...}, ...]")
     print("  - JSON Lines: {...}\\n{...}\\n...")
@@ -702,12 +1421,31 @@ if __name__ == "__main__":
     if sys.argv[1] in ['-h', '--help', 'help']:
         show_usage()
         sys.exit(0)
+
+    if sys.argv[1] == '--merge-stats':
+        if len(sys.argv) < 4:
+            show_usage()
+            sys.exit(1)
+        try:
+            merged = merge_stats_files(sys.argv[3:], sys.argv[2])
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Merged statistics for {merged.total} papers saved to: {sys.argv[2]}")
+        sys.exit(0)
     
     input_file = sys.argv[1]
     output_file = None
     physics_only = True
     qbio_only = False
     agriculture_only = False
+    stats_file = None
+    dedup = False
+    bloom_capacity = None
+    duplicates_file = None
+    profile = False
+    profile_sample = 1000
+    profile_prefix = 'conversion_profile'
 
     # Parse additional arguments
     if len(sys.argv) > 2:
@@ -722,11 +1460,45 @@ if __name__ == "__main__":
                 physics_only = False
                 qbio_only = False
                 agriculture_only = True
+            elif arg.startswith('--stats='):
+                stats_file = arg.split('=', 1)[1]
+            elif arg == '--dedup':
+                dedup = True
+            elif arg.startswith('--dedup-bloom='):
+                dedup = True
+                value = arg.split('=', 1)[1]
+                bloom_capacity = int(value) if value.isdigit() else 0
+                if bloom_capacity < 1:
+                    print(f"Error: --dedup-bloom expects a positive integer, got '{value}'", file=sys.stderr)
+                    show_usage()
+                    sys.exit(1)
+            elif arg.startswith('--duplicates='):
+                dedup = True
+                duplicates_file = arg.split('=', 1)[1]
+            elif arg == '--profile':
+                profile = True
+            elif arg.startswith('--profile-sample='):
+                profile = True
+                value = arg.split('=', 1)[1]
+                profile_sample = int(value) if value.isdigit() else 0
+                if profile_sample < 1:
+                    print(f"Error: --profile-sample expects a positive integer, got '{value}'", file=sys.stderr)
+                    show_usage()
+                    sys.exit(1)
+            elif arg.startswith('--profile-out='):
+                profile = True
+                profile_prefix = arg.split('=', 1)[1]
             elif not arg.startswith('--'):
                 output_file = arg
 
     try:
-        results = process_json_file(input_file, output_file, physics_only, qbio_only, agriculture_only)
+        if profile:
+            profile_json_file(input_file, profile_sample, profile_prefix, physics_only, qbio_only, agriculture_only,
+                              stats_file is not None, dedup, bloom_capacity)
+            sys.exit(0)
+
+        results = process_json_file(input_file, output_file, physics_only, qbio_only, agriculture_only, stats_file,
+                                    dedup, bloom_capacity, duplicates_file)
 
         if not output_file:
             print(f"\nUse --help for more options")